@@ -1,4 +1,5 @@
 from abc import ABC
+import functools
 import numpy as np
 
 from p5.core import p5
@@ -9,10 +10,22 @@ from dataclasses import dataclass
 from vispy.gloo import Program, VertexBuffer, FrameBuffer, IndexBuffer
 from OpenGL.GLU import gluTessBeginPolygon, gluTessBeginContour, gluTessEndPolygon, gluTessEndContour, gluTessVertex
 
+try:
+    import mapbox_earcut
+except ImportError:
+    mapbox_earcut = None
+
 # Useful constants
 COLOR_WHITE = (1, 1, 1, 1)
 COLOR_BLACK = (0, 0, 0, 1)
 
+# Offsets of the two triangles (0, 1, 2) and (0, 2, 3) that make up
+# each quad, and of the edge end points of a quad's four borders.
+_QUAD_TRI_PATTERN = np.array([0, 1, 2, 0, 2, 3], dtype=np.uint32)
+_QUAD_EDGE_PATTERN = np.array([1, 2, 3, 0], dtype=np.uint32)
+_QUAD_TRI_PATTERN.setflags(write=False)
+_QUAD_EDGE_PATTERN.setflags(write=False)
+
 
 def to_3x3(mat):
     """Returns the upper left 3x3 corner of an np.array
@@ -20,6 +33,19 @@ def to_3x3(mat):
     return mat[:3, :3]
 
 
+def to_homogeneous(vertices):
+    """Returns an (N, 4) array of homogeneous coordinates for a list of
+    2D or 3D vertices, with z = 0 for 2D vertices and w = 1.
+    """
+    vertices = np.asarray(vertices)
+    n_vert, dim = vertices.shape
+    homog = np.empty((n_vert, 4))
+    homog[:, :dim] = vertices
+    homog[:, dim:3] = 0.0
+    homog[:, 3] = 1.0
+    return homog
+
+
 def _tess_new_contour(vertices):
     """Given a list of vertices, evoke gluTess to create a contour
     """
@@ -29,6 +55,58 @@ def _tess_new_contour(vertices):
     gluTessEndContour(p5.tess.tess)
 
 
+def _earcut_triangulate(vertices, contours):
+    """Triangulates a polygon (and its holes) using mapbox_earcut
+
+    :returns: ['triangles', vertices, idx] or None if the polygon
+        can't be handled by earcut and GLU should be used instead.
+    """
+    if mapbox_earcut is None:
+        return None
+
+    rings = [vertices] + list(contours)
+    try:
+        all_verts = np.vstack([np.asarray(r, dtype=np.float64) for r in rings])
+    except ValueError:  # rings with a different number of coordinates
+        return None
+
+    if all_verts.shape[1] < 2:
+        return None
+    # earcut works in the xy-plane, leave anything else to GLU
+    if all_verts.shape[1] > 2 and np.ptp(all_verts[:, 2:], axis=0).any():
+        return None
+
+    ring_ends = np.cumsum([len(r) for r in rings], dtype=np.uint32)
+    idx = mapbox_earcut.triangulate_float32(
+        np.ascontiguousarray(all_verts[:, :2], dtype=np.float32), ring_ends)
+
+    # earcut can't handle self-intersecting outlines or contours that
+    # lie outside of the outline. In these cases the triangles don't
+    # cover the area of the polygon, so leave them to GLU.
+    ring_starts = np.concatenate(([0], ring_ends[:-1]))
+    ring_areas = [_polygon_area(all_verts[start:end, :2])
+                  for start, end in zip(ring_starts, ring_ends)]
+    expected_area = ring_areas[0] - sum(ring_areas[1:])
+    tri = all_verts[idx.reshape(-1, 3), :2]
+    u = tri[:, 1] - tri[:, 0]
+    v = tri[:, 2] - tri[:, 0]
+    tri_area = 0.5 * np.abs(u[:, 0] * v[:, 1] - u[:, 1] * v[:, 0]).sum()
+    if not np.isclose(tri_area, expected_area, rtol=1e-4,
+                      atol=1e-9 * max(ring_areas[0], 1.0)):
+        return None
+
+    return ['triangles', all_verts, idx.astype(np.uint32, copy=False)]
+
+
+def _polygon_area(ring):
+    """Returns the (unsigned) area enclosed by a ring of 2D vertices
+    using the shoelace formula
+    """
+    x = ring[:, 0]
+    y = ring[:, 1]
+    return 0.5 * abs(np.dot(x, np.roll(y, -1)) - np.dot(y, np.roll(x, -1)))
+
+
 def _vertices_to_render_primitive(gl_name, vertices):
     """Returns a render primitive of gl_type with vertices in sequential order
     """
@@ -39,9 +117,8 @@ def _vertices_to_render_primitive(gl_name, vertices):
 def _get_line_from_verts(vertices):
     """Given a list of vertices, chain them sequentially in a line rendering primitive
     """
-    n_vert = len(vertices)
-    return _get_line_from_indices(vertices, np.arange(
-        n_vert - 1, dtype=np.uint32), np.arange(1, n_vert, dtype=np.uint32))
+    start, end = _line_strip_border_idx(len(vertices))
+    return _get_line_from_indices(vertices, start, end)
 
 
 def _get_line_from_indices(vertices, start, end):
@@ -87,22 +164,149 @@ def _wrong_multiple(shape, n):
         shape.shape_type, n)
 
 
+# Minimum number of vertices needed for each shape type
+_CHECK_MIN_VERTS = {
+    SType.TRIANGLES: 3,
+    SType.TRIANGLE_FAN: 3,
+    SType.TRIANGLE_STRIP: 3,
+    SType.LINES: 2,
+    SType.LINE_STRIP: 2,
+    SType.QUADS: 4,
+    SType.QUAD_STRIP: 4,
+}
+
+# Shape types whose number of vertices must be a multiple of n
+_CHECK_MULTIPLE = {
+    SType.TRIANGLES: 3,
+    SType.QUADS: 4,
+}
+
+
 def _check_shape(shape):
-    """Checks if the shape is valid using assertions
+    """Checks if the shape has a valid number of vertices
+
+    :raises ValueError: if the shape has too few vertices or the
+        number of vertices is not a multiple of what its shape type
+        requires.
     """
+    min_verts = _CHECK_MIN_VERTS.get(shape.shape_type)
+    if min_verts is None:  # POINTS and TESS can have any number of vertices
+        return
+
     n_vert = len(shape.vertices)
-    if shape.shape_type in [SType.TRIANGLES,
-                            SType.TRIANGLE_FAN, SType.TRIANGLE_STRIP]:
-        assert n_vert >= 3, _not_enough_vertices(shape, 3)
-    elif shape.shape_type in [SType.LINES, SType.LINE_STRIP]:
-        assert n_vert >= 2, _not_enough_vertices(shape, 2)
-    elif shape.shape_type in [SType.QUADS, SType.QUAD_STRIP]:
-        assert n_vert >= 4, _not_enough_vertices(shape, 4)
+    if n_vert < min_verts:
+        raise ValueError(_not_enough_vertices(shape, min_verts))
+
+    multiple = _CHECK_MULTIPLE.get(shape.shape_type)
+    if multiple is not None and n_vert % multiple != 0:
+        raise ValueError(_wrong_multiple(shape, multiple))
+
+
+def _edge_indices(func):
+    """A decorator that caches the (start, end) edge index arrays
+    generated for a given number of vertices.
+
+    The arrays are shared between calls and hence marked read-only.
+    """
+
+    @functools.lru_cache(maxsize=256)
+    @functools.wraps(func)
+    def cached(n_vert):
+        start, end = func(n_vert)
+        start = np.asarray(start, dtype=np.uint32)
+        end = np.asarray(end, dtype=np.uint32)
+        start.setflags(write=False)
+        end.setflags(write=False)
+        return start, end
+
+    return cached
+
+
+@_edge_indices
+def _triangles_border_idx(n_vert):
+    start = np.arange(n_vert)
+    end = np.arange(n_vert) + np.tile([1, 1, -2], n_vert // 3)
+    return start, end
+
+
+@_edge_indices
+def _triangle_strip_border_idx(n_vert):
+    start = np.concatenate((np.arange(n_vert - 1), np.arange(n_vert - 2)))
+    end = np.concatenate((np.arange(1, n_vert), np.arange(2, n_vert)))
+    return start, end
+
+
+@_edge_indices
+def _triangle_fan_border_idx(n_vert):
+    start = np.concatenate(
+        (np.repeat([0], n_vert - 1), np.arange(1, n_vert - 1)))
+    end = np.concatenate((np.arange(1, n_vert), np.arange(2, n_vert)))
+    return start, end
+
+
+@_edge_indices
+def _quads_border_idx(n_vert):
+    starts = np.arange(0, n_vert, 4, dtype=np.uint32).reshape(-1, 1)
+    start = np.arange(n_vert)
+    end = (starts + _QUAD_EDGE_PATTERN).ravel()
+    return start, end
+
+
+@_edge_indices
+def _quad_strip_border_idx(n_vert):
+    start = np.concatenate((np.arange(0, n_vert, 2), np.arange(n_vert - 2)))
+    end = np.concatenate((np.arange(1, n_vert, 2), np.arange(2, n_vert)))
+    return start, end
+
+
+@_edge_indices
+def _lines_border_idx(n_vert):
+    start = np.arange(0, n_vert, 2)
+    end = np.arange(1, n_vert, 2)
+    return start, end
+
+
+@_edge_indices
+def _line_strip_border_idx(n_vert):
+    return np.arange(n_vert - 1), np.arange(1, n_vert)
+
+
+def _edge_borders(index_func):
+    """Returns a border handler that draws the edges generated by
+    index_func for the number of vertices of the shape
+    """
+
+    def borders(shape):
+        render_primitives = []
+        start, end = index_func(len(shape.vertices))
+        _add_edges_to_primitive_list(
+            render_primitives, shape.vertices, start, end)
+        return render_primitives
+
+    return borders
+
+
+def _line_strip_borders(shape):
+    return [_get_line_from_verts(shape.vertices)]
 
-    if shape.shape_type == SType.TRIANGLES:
-        assert n_vert % 3 == 0, _wrong_multiple(shape, 3)
-    if shape.shape_type == SType.QUADS:
-        assert n_vert % 4 == 0, _wrong_multiple(shape, 4)
+
+def _tess_borders(shape):
+    render_primitives = [_get_line_from_verts(shape.vertices)]
+    for contour in shape.contours:
+        render_primitives.append(_get_line_from_verts(contour))
+    return render_primitives
+
+
+_BORDER_HANDLERS = {
+    SType.TRIANGLES: _edge_borders(_triangles_border_idx),
+    SType.TRIANGLE_STRIP: _edge_borders(_triangle_strip_border_idx),
+    SType.TRIANGLE_FAN: _edge_borders(_triangle_fan_border_idx),
+    SType.QUADS: _edge_borders(_quads_border_idx),
+    SType.QUAD_STRIP: _edge_borders(_quad_strip_border_idx),
+    SType.LINES: _edge_borders(_lines_border_idx),
+    SType.LINE_STRIP: _line_strip_borders,
+    SType.TESS: _tess_borders,
+}
 
 
 def _get_borders(shape):
@@ -110,49 +314,51 @@ def _get_borders(shape):
 
     :returns: ['lines', vertices, idx]
     """
-    render_primitives = []
-    n_vert = len(shape.vertices)
-    if shape.shape_type == SType.TRIANGLES:
-        start = np.arange(n_vert)
-        end = np.arange(n_vert) + np.tile([1, 1, -2], n_vert // 3)
-        _add_edges_to_primitive_list(
-            render_primitives, shape.vertices, start, end)
-    elif shape.shape_type == SType.TRIANGLE_STRIP:
-        start = np.concatenate((np.arange(n_vert - 1), np.arange(n_vert - 2)))
-        end = np.concatenate((np.arange(1, n_vert), np.arange(2, n_vert)))
-        _add_edges_to_primitive_list(
-            render_primitives, shape.vertices, start, end)
-    elif shape.shape_type == SType.TRIANGLE_FAN:
-        start = np.concatenate(
-            (np.repeat([0], n_vert - 1), np.arange(1, n_vert - 1)))
-        end = np.concatenate((np.arange(1, n_vert), np.arange(2, n_vert)))
-        _add_edges_to_primitive_list(
-            render_primitives, shape.vertices, start, end)
-    elif shape.shape_type == SType.QUADS:
-        start = np.arange(n_vert)
-        end = np.arange(n_vert) + np.tile([1, 1, 1, -3], n_vert // 4)
-        _add_edges_to_primitive_list(
-            render_primitives, shape.vertices, start, end)
-    elif shape.shape_type == SType.QUAD_STRIP:
-        start = np.concatenate(
-            (np.arange(
-                0, n_vert, 2), np.arange(
-                n_vert - 2)))
-        end = np.concatenate((np.arange(1, n_vert, 2), np.arange(2, n_vert)))
-        _add_edges_to_primitive_list(
-            render_primitives, shape.vertices, start, end)
-    elif shape.shape_type == SType.LINES:
-        start = np.arange(0, n_vert, 2)
-        end = np.arange(1, n_vert, 2)
-        _add_edges_to_primitive_list(
-            render_primitives, shape.vertices, start, end)
-    elif shape.shape_type == SType.LINE_STRIP:
-        render_primitives.append(_get_line_from_verts(shape.vertices))
-    elif shape.shape_type == SType.TESS:
-        render_primitives.append(_get_line_from_verts(shape.vertices))
+    handler = _BORDER_HANDLERS.get(shape.shape_type)
+    return handler(shape) if handler else []
+
+
+def _sequential_meshes(gl_name):
+    """Returns a mesh handler that draws the vertices of the shape in
+    order as gl_name
+    """
+
+    def meshes(shape):
+        return [_vertices_to_render_primitive(gl_name, shape.vertices)]
+
+    return meshes
+
+
+def _quads_meshes(shape):
+    starts = np.arange(0, len(shape.vertices), 4,
+                       dtype=np.uint32).reshape(-1, 1)
+    return [['triangles', np.asarray(shape.vertices),
+             (starts + _QUAD_TRI_PATTERN).ravel()]]
+
+
+def _tess_meshes(shape):
+    primitive = _earcut_triangulate(shape.vertices, shape.contours)
+    if primitive is not None:
+        return [primitive] if len(primitive[2]) > 0 else []
+
+    gluTessBeginPolygon(p5.tess.tess, None)
+    _tess_new_contour(shape.vertices)
+    if len(shape.contours) > 0:
         for contour in shape.contours:
-            render_primitives.append(_get_line_from_verts(contour))
-    return render_primitives
+            _tess_new_contour(contour)
+    gluTessEndPolygon(p5.tess.tess)
+    return p5.tess.get_result()
+
+
+_MESH_HANDLERS = {
+    SType.TRIANGLES: _sequential_meshes('triangles'),
+    SType.TRIANGLE_STRIP: _sequential_meshes('triangle_strip'),
+    SType.TRIANGLE_FAN: _sequential_meshes('triangle_fan'),
+    # vispy does not support quad_strip but it can be drawn using triangle_strip
+    SType.QUAD_STRIP: _sequential_meshes('triangle_strip'),
+    SType.QUADS: _quads_meshes,
+    SType.TESS: _tess_meshes,
+}
 
 
 def _get_meshes(shape):
@@ -160,30 +366,8 @@ def _get_meshes(shape):
 
     :returns: [shape_type, vertices, idx]
     """
-    render_primitives = []
-    n_vert = len(shape.vertices)
-    if shape.shape_type in [
-            SType.TRIANGLES, SType.TRIANGLE_STRIP, SType.TRIANGLE_FAN, SType.QUAD_STRIP]:
-        gl_name = shape.shape_type.name.lower()
-        if gl_name == 'quad_strip':  # vispy does not support quad_strip
-            gl_name = 'triangle_strip'  # but it can be drawn using triangle_strip
-        render_primitives.append(
-            _vertices_to_render_primitive(
-                gl_name, shape.vertices))
-    elif shape.shape_type == SType.QUADS:
-        n_quad = len(shape.vertices) // 4
-        render_primitives.append(['triangles', np.asarray(shape.vertices),
-                                  np.repeat(np.arange(0, n_vert, 4, dtype=np.uint32), 6) +
-                                  np.tile(np.array([0, 1, 2, 0, 2, 3], dtype=np.uint32), n_quad)])
-    elif shape.shape_type == SType.TESS:
-        gluTessBeginPolygon(p5.tess.tess, None)
-        _tess_new_contour(shape.vertices)
-        if len(shape.contours) > 0:
-            for contour in shape.contours:
-                _tess_new_contour(contour)
-        gluTessEndPolygon(p5.tess.tess)
-        render_primitives += p5.tess.get_result()
-    return render_primitives
+    handler = _MESH_HANDLERS.get(shape.shape_type)
+    return handler(shape) if handler else []
 
 
 def get_render_primitives(shape):
@@ -279,6 +463,9 @@ class OpenGLRenderer(ABC):
         self.transform_matrix = np.identity(4)
         self.projection_matrix = np.identity(4)
 
+        # Scratch space for transformed vertices, grown as needed
+        self._xform_scratch = np.empty((1024, 4))
+
         # Renderer Globals: RENDERING
         self.draw_queue = []
 
@@ -344,8 +531,14 @@ class OpenGLRenderer(ABC):
     def _transform_vertices(self, vertices, local_matrix, global_matrix):
         """Applies `local_matrix` then `global_matrix` to `vertices`
         """
-        product = np.dot(np.dot(vertices, local_matrix.T), global_matrix.T)
-        # dehomogenize coordinates
-        # need np.newaxis to broadcast the vector because each row represents a vertex
-        dehomogenized = product / product[:,3][:,np.newaxis]
-        return dehomogenized[:,:3] # Return the first three rows of the result
+        n_vert = len(vertices)
+        if n_vert > len(self._xform_scratch):
+            self._xform_scratch = np.empty(
+                (max(n_vert, 2 * len(self._xform_scratch)), 4))
+        product = self._xform_scratch[:n_vert]
+
+        # Combine both (4, 4) matrices first so the vertices are only
+        # multiplied once
+        np.matmul(vertices, np.dot(global_matrix, local_matrix).T, out=product)
+        # dehomogenize coordinates and return the first three columns
+        return product[:, :3] / product[:, 3:]
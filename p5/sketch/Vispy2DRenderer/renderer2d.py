@@ -16,6 +16,8 @@
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 #
 
+import functools
+import itertools
 import numpy as np
 import math
 from p5.pmath import matrix
@@ -31,10 +33,55 @@ from vispy.gloo import VertexBuffer
 from contextlib import contextmanager
 from .shaders2d import src_texture
 from .shaders2d import src_line
-from .openglrenderer import OpenGLRenderer, get_render_primitives, COLOR_WHITE
+from .openglrenderer import OpenGLRenderer, get_render_primitives, to_homogeneous, COLOR_WHITE
 from p5.core.constants import SType
 from .shape import PShape, Arc
 
+# Interleaved per-vertex attributes of the line shader
+_LINE_DTYPE = np.dtype([('pos', np.float32, 3),
+                        ('posPrev', np.float32, 3),
+                        ('posCurr', np.float32, 3),
+                        ('posNext', np.float32, 3),
+                        ('marker', np.float32),
+                        ('side', np.float32),
+                        ('linewidth', np.float32),
+                        ('join_type', np.float32),
+                        ('cap_type', np.float32),
+                        ('color', np.float32, 4)])
+
+# Each line segment is drawn as two triangles. For each of their six
+# vertices these give the offset of the current vertex within the
+# segment, whether the vertex is up/below the line segment and
+# whether it is on the left or right side of the segment.
+_LINE_J_PATTERN = np.array([0, 0, 1, 0, 1, 1], dtype=np.int32)
+_LINE_MARKER_PATTERN = np.array([1.0, -1.0, -1.0, -1.0, 1.0, -1.0],
+                                dtype=np.float32)
+_LINE_SIDE_PATTERN = np.array([1.0, 1.0, -1.0, 1.0, -1.0, -1.0],
+                              dtype=np.float32)
+_LINE_J_PATTERN.setflags(write=False)
+_LINE_MARKER_PATTERN.setflags(write=False)
+_LINE_SIDE_PATTERN.setflags(write=False)
+
+
+@functools.lru_cache(maxsize=16)
+def _line_segment_indices(seg_len):
+    """Returns the indices of the previous, current and next vertex
+    (local to a segment of seg_len vertices) for each of the vertices
+    of the triangles drawn for that segment.
+    """
+    left = np.repeat(np.arange(seg_len - 1), 6)
+    curr = left + np.tile(_LINE_J_PATTERN, seg_len - 1)
+    prev = np.maximum(curr - 1, 0)
+    nxt = np.minimum(curr + 1, seg_len - 1)
+    for idx in (prev, curr, nxt):
+        idx.setflags(write=False)
+    return prev, curr, nxt
+
+
+# Primitive types that can be merged into a single draw call. Strips
+# and fans can't, since their vertices would be joined together.
+_BATCHABLE_TYPES = {'lines', 'triangles', 'points'}
+
 
 class VispyRenderer2D(OpenGLRenderer):
     def __init__(self):
@@ -42,7 +89,49 @@ class VispyRenderer2D(OpenGLRenderer):
         self.texture_prog = Program(src_texture.vert, src_texture.frag)
         self.texture_prog['texcoord'] = self.fbuf_texcoords
         self.line_prog = None
-        self.modelview_matrix = np.identity(4)
+        self.line_buffer = VertexBuffer()
+        self._IDENTITY4 = np.identity(4)
+        self.modelview_matrix = self._IDENTITY4.copy()
+
+        # Quad used to draw images. Only the positions change from one
+        # image to the next, so the buffer is allocated once and reused.
+        self._image_quad = np.zeros(4,
+                                    dtype=[('position', np.float32, 2),
+                                           ('texcoord', np.float32, 2)])
+        self._image_quad['texcoord'] = np.array([[0.0, 1.0],
+                                                 [1.0, 1.0],
+                                                 [0.0, 0.0],
+                                                 [1.0, 0.0]],
+                                                dtype=np.float32)
+        self._image_vbo = VertexBuffer(self._image_quad)
+
+    @property
+    def modelview_matrix(self):
+        return self._modelview_matrix
+
+    @modelview_matrix.setter
+    def modelview_matrix(self, mat):
+        self._modelview_matrix = mat
+        self._mv_flat = mat.T.flatten()
+        self._view_dirty = True
+
+    @property
+    def projection_matrix(self):
+        return self._projection_matrix
+
+    @projection_matrix.setter
+    def projection_matrix(self, mat):
+        self._projection_matrix = mat
+        self._proj_flat = mat.T.flatten()
+        self._view_dirty = True
+
+    def _upload_view(self):
+        """Upload the modelview and projection matrices to the shaders.
+        """
+        for prog in [self.default_prog, self.texture_prog, self.line_prog]:
+            prog['modelview'] = self._mv_flat
+            prog['projection'] = self._proj_flat
+        self._view_dirty = False
 
     def reset_view(self):
         self.viewport = (
@@ -67,26 +156,18 @@ class VispyRenderer2D(OpenGLRenderer):
             0.1 * cz,
             10 * cz
         )
-        self.modelview_matrix = matrix.translation_matrix(-builtins.width / 2,
-                                                          builtins.height / 2,
-                                                          -cz)
-        self.modelview_matrix = self.modelview_matrix.dot(
-            matrix.scale_transform(1, -1, 1))
-
-        self.transform_matrix = np.identity(4)
-
-        self.default_prog['modelview'] = self.modelview_matrix.T.flatten()
-        self.default_prog['projection'] = self.projection_matrix.T.flatten()
+        self.modelview_matrix = matrix.translation_matrix(
+            -builtins.width / 2,
+            builtins.height / 2,
+            -cz).dot(matrix.scale_transform(1, -1, 1))
 
-        self.texture_prog['modelview'] = self.modelview_matrix.T.flatten()
-        self.texture_prog['projection'] = self.projection_matrix.T.flatten()
+        self.transform_matrix = self._IDENTITY4.copy()
 
         self.line_prog = Program(src_line.vert, src_line.frag)
-
-        self.line_prog['modelview'] = self.modelview_matrix.T.flatten()
-        self.line_prog['projection'] = self.projection_matrix.T.flatten()
         self.line_prog["height"] = builtins.height
 
+        self._upload_view()
+
         self.fbuffer_tex_front = Texture2D(
             (builtins.height, builtins.width, 3))
         self.fbuffer_tex_back = Texture2D((builtins.height, builtins.width, 3))
@@ -114,10 +195,12 @@ class VispyRenderer2D(OpenGLRenderer):
         """The main draw loop context manager.
         """
 
-        self.transform_matrix = np.identity(4)
+        self.transform_matrix = self._IDENTITY4.copy()
 
-        self.default_prog['modelview'] = self.modelview_matrix.T.flatten()
-        self.default_prog['projection'] = self.projection_matrix.T.flatten()
+        # The matrices only change in reset_view() or through
+        # perspective()/ortho(), so only upload them when needed.
+        if self._view_dirty:
+            self._upload_view()
 
         self.fbuffer.color_buffer = self.fbuffer_tex_back
 
@@ -130,7 +213,7 @@ class VispyRenderer2D(OpenGLRenderer):
             yield
 
             self.flush_geometry()
-            self.transform_matrix = np.identity(4)
+            self.transform_matrix = self._IDENTITY4.copy()
 
         gloo.set_viewport(*self.viewport)  # pylint: disable=no-member
         self._comm_toggles(False)
@@ -160,12 +243,9 @@ class VispyRenderer2D(OpenGLRenderer):
         obj_list = get_render_primitives(shape)
         for obj in obj_list:
             stype, vertices, idx = obj
-            # Convert 2D vertices to 3D by adding "0" column, needed for further transformations
-            if len(vertices[0]) == 2:
-                vertices = np.hstack([vertices,  np.zeros((len(vertices), 1))])
             # Transform vertices
             vertices = self._transform_vertices(
-                np.hstack([vertices, np.ones((len(vertices), 1))]),
+                to_homogeneous(vertices),
                 shape._matrix,
                 self.transform_matrix)
             # Add to draw queue
@@ -181,19 +261,22 @@ class VispyRenderer2D(OpenGLRenderer):
 
     def flush_geometry(self):
         """Flush all the shape geometry from the draw queue to the GPU.
-        """
-        current_queue = []
-        for index, shape in enumerate(self.draw_queue):
-            current_shape = self.draw_queue[index][0]
-            current_queue.append(self.draw_queue[index][1])
 
-            if current_shape == "lines":
+        Consecutive shapes of the same (batchable) type are drawn with
+        a single draw call.
+        """
+        for current_shape, group in itertools.groupby(
+                self.draw_queue, key=lambda entry: entry[0]):
+            current_queue = [obj for _, obj in group]
+
+            if current_shape not in _BATCHABLE_TYPES:
+                for obj in current_queue:
+                    self.render_default(current_shape, [obj])
+            elif current_shape == "lines":
                 self.render_line(current_queue)
             else:
                 self.render_default(current_shape, current_queue)
 
-            current_queue = []
-
         self.draw_queue = []
 
     def render_line(self, queue):
@@ -207,18 +290,6 @@ class VispyRenderer2D(OpenGLRenderer):
         if len(queue) == 0:
             return
 
-        pos = []
-        posPrev = []
-        posCurr = []
-        posNext = []
-        markers = []
-        side = []
-
-        linewidth = []
-        join_type = []
-        cap_type = []
-        color = []
-
         stroke_cap_codes = {
             'PROJECT': 0,
             'SQUARE': 1,
@@ -231,63 +302,57 @@ class VispyRenderer2D(OpenGLRenderer):
             'ROUND': 2
         }
 
+        # First pass: find the lines to draw and the number of
+        # vertices needed for them
+        lines = []
+        total = 0
         for line in queue:
             if len(line[1]) == 0:
                 continue
 
-            for segment in line[1]:
-                for i in range(
-                        len(segment) - 1):  # the data is sent to renderer in line segments
-                    for j in [
-                        0, 0, 1, 0, 1, 1]:  # all the vertices of triangles
-                        if i + j - 1 >= 0:
-                            posPrev.append(line[0][segment[i + j - 1]])
-                        else:
-                            posPrev.append(line[0][segment[i + j]])
-
-                        if i + j + 1 < len(segment):
-                            posNext.append(line[0][segment[i + j + 1]])
-                        else:
-                            posNext.append(line[0][segment[i + j]])
-
-                        posCurr.append(line[0][segment[i + j]])
-
-                    # Is the vertex up/below the line segment
-                    markers.extend([1.0, -1.0, -1.0, -1.0, 1.0, -1.0])
-                    # Left or right side of the segment
-                    side.extend([1.0, 1.0, -1.0, 1.0, -1.0, -1.0])
-                    # Left vertex of each segment
-                    pos.extend([line[0][segment[i]]] * 6)
-                    linewidth.extend([line[3]] * 6)
-                    join_type.extend([stroke_join_codes[line[5]]] * 6)
-                    cap_type.extend([stroke_cap_codes[line[4]]] * 6)
-                    color.extend([line[2]] * 6)
-
-        if len(pos) == 0:
-            return
+            # the data is sent to renderer in line segments
+            segments = np.asarray(line[1])
+            n_seg, seg_len = segments.shape
+            if seg_len < 2:
+                continue
+
+            lines.append((line, segments))
+            total += 6 * n_seg * (seg_len - 1)
 
-        posPrev = np.array(posPrev, np.float32)
-        posCurr = np.array(posCurr, np.float32)
-        posNext = np.array(posNext, np.float32)
-        markers = np.array(markers, np.float32)
-        side = np.array(side, np.float32)
-        pos = np.array(pos, np.float32)
-        linewidth = np.array(linewidth, np.float32)
-        join_type = np.array(join_type, np.float32)
-        cap_type = np.array(cap_type, np.float32)
-        color = np.array(color, np.float32)
-
-        self.line_prog['pos'] = gloo.VertexBuffer(pos)
-        self.line_prog['posPrev'] = gloo.VertexBuffer(posPrev)
-        self.line_prog['posCurr'] = gloo.VertexBuffer(posCurr)
-        self.line_prog['posNext'] = gloo.VertexBuffer(posNext)
-        self.line_prog['marker'] = gloo.VertexBuffer(markers)
-        self.line_prog['side'] = gloo.VertexBuffer(side)
-        self.line_prog['linewidth'] = gloo.VertexBuffer(linewidth)
-        self.line_prog['join_type'] = gloo.VertexBuffer(join_type)
-        self.line_prog['cap_type'] = gloo.VertexBuffer(cap_type)
-        self.line_prog["color"] = gloo.VertexBuffer(color)
+        if total == 0:
+            return
 
+        # Second pass: fill in the interleaved vertex data
+        data = np.empty(total, dtype=_LINE_DTYPE)
+        sidx = 0
+        for line, segments in lines:
+            vertices = np.asarray(line[0], dtype=np.float32)
+            n_seg, seg_len = segments.shape
+
+            prev, curr, nxt = _line_segment_indices(seg_len)
+
+            n_pieces = n_seg * (seg_len - 1)
+            line_data = data[sidx:sidx + 6 * n_pieces]
+
+            # Splitting the first axis of the field views never copies,
+            # so the per-piece values can be broadcast straight into
+            # the buffer.
+            line_data['pos'].reshape(n_seg, seg_len - 1, 6, 3)[:] = \
+                vertices[segments[:, :-1]][:, :, np.newaxis]
+            line_data['posPrev'] = vertices[segments[:, prev]].reshape(-1, 3)
+            line_data['posCurr'] = vertices[segments[:, curr]].reshape(-1, 3)
+            line_data['posNext'] = vertices[segments[:, nxt]].reshape(-1, 3)
+            line_data['marker'].reshape(n_pieces, 6)[:] = _LINE_MARKER_PATTERN
+            line_data['side'].reshape(n_pieces, 6)[:] = _LINE_SIDE_PATTERN
+            line_data['linewidth'] = line[3]
+            line_data['join_type'] = stroke_join_codes[line[5]]
+            line_data['cap_type'] = stroke_cap_codes[line[4]]
+            line_data['color'] = line[2]
+
+            sidx += 6 * n_pieces
+
+        self.line_buffer.set_data(data)
+        self.line_prog.bind(self.line_buffer)
         self.line_prog.draw('triangles')
 
     def render_image(self, image, location, size):
@@ -309,23 +374,14 @@ class VispyRenderer2D(OpenGLRenderer):
 
         x, y = location
         sx, sy = size
-        imx, imy = image.size
-        data = np.zeros(4,
-                        dtype=[('position', np.float32, 2),
-                               ('texcoord', np.float32, 2)])
-        data['texcoord'] = np.array([[0.0, 1.0],
-                                     [1.0, 1.0],
-                                     [0.0, 0.0],
-                                     [1.0, 0.0]],
-                                    dtype=np.float32)
-        data['position'] = np.array([[x, y + sy],
-                                     [x + sx, y + sy],
-                                     [x, y],
-                                     [x + sx, y]],
-                                    dtype=np.float32)
+        self._image_quad['position'] = [[x, y + sy],
+                                        [x + sx, y + sy],
+                                        [x, y],
+                                        [x + sx, y]]
+        self._image_vbo.set_data(self._image_quad)
 
         self.texture_prog['texture'] = image._texture
-        self.texture_prog.bind(VertexBuffer(data))
+        self.texture_prog.bind(self._image_vbo)
         self.texture_prog.draw('triangle_strip')
 
     def cleanup(self):
@@ -35,7 +35,7 @@ from p5.core.geometry import Geometry
 from ..Vispy2DRenderer.shape import PShape
 
 from p5.pmath.matrix import translation_matrix
-from ..Vispy2DRenderer.openglrenderer import OpenGLRenderer, get_render_primitives, to_3x3, Style, COLOR_WHITE
+from ..Vispy2DRenderer.openglrenderer import OpenGLRenderer, get_render_primitives, to_3x3, to_homogeneous, Style, COLOR_WHITE
 from .shaders3d import src_default, src_fbuffer, src_normal, src_phong
 from p5.core.material import BasicMaterial, NormalMaterial, BlinnPhongMaterial
 
@@ -272,7 +272,7 @@ class Renderer3D(OpenGLRenderer):
                 stype, vertices, idx = obj
                 # Transform vertices
                 vertices = self._transform_vertices(
-                    np.hstack([vertices, np.ones((len(vertices), 1))]),
+                    to_homogeneous(vertices),
                     shape._matrix,
                     self.transform_matrix)
                 # Add to draw queue
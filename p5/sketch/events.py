@@ -17,6 +17,7 @@
 #
 
 import builtins
+import sys
 from collections import namedtuple
 from enum import IntEnum
 
@@ -34,6 +35,32 @@ class VispyButton(IntEnum):
     MIDDLE = 3
 
 
+_BUTTON_MAP = {
+    'CENTER': VispyButton.MIDDLE,
+    'MIDDLE': VispyButton.MIDDLE,
+    'LEFT': VispyButton.LEFT,
+    'RIGHT': VispyButton.RIGHT,
+}
+
+_BUTTON_NAMES = {
+    VispyButton.LEFT: 'LEFT',
+    VispyButton.RIGHT: 'RIGHT',
+    VispyButton.MIDDLE: 'MIDDLE',
+}
+
+_SHIFT = 1
+_CTRL = 2
+_ALT = 4
+_META = 8
+
+_MOD_BITS = {
+    'Shift': _SHIFT,
+    'Control': _CTRL,
+    'Alt': _ALT,
+    'Meta': _META,
+}
+
+
 class MouseButton:
     """An abstraction over a set of mouse buttons.
 
@@ -42,29 +69,19 @@ class MouseButton:
 
     """
 
-    def __init__(self, buttons):
-        button_names = {
-            VispyButton.LEFT: 'LEFT',
-            VispyButton.RIGHT: 'RIGHT',
-            VispyButton.MIDDLE: 'MIDDLE',
-        }
+    __slots__ = ('_buttons', '_button_names')
 
-        self._buttons = buttons
-        self._button_names = [button_names[bt] for bt in self._buttons]
+    def __init__(self, buttons):
+        self._buttons = frozenset(buttons)
+        self._button_names = tuple(_BUTTON_NAMES[bt] for bt in buttons)
 
     @property
     def buttons(self):
-        self._button_names
+        return self._button_names
 
     def __eq__(self, other):
-        button_map = {
-            'CENTER': VispyButton.MIDDLE,
-            'MIDDLE': VispyButton.MIDDLE,
-            'LEFT': VispyButton.LEFT,
-            'RIGHT': VispyButton.RIGHT,
-        }
         if isinstance(other, str):
-            return button_map.get(other.upper(), -1) in self._buttons
+            return _BUTTON_MAP.get(other.upper(), -1) in self._buttons
         return self._buttons == other._buttons
 
     def __neq__(self, other):
@@ -90,9 +107,15 @@ class Key:
 
     """
 
+    __slots__ = ('name', 'text')
+
     def __init__(self, name, text=''):
-        self.name = name.upper()
-        self.text = text
+        # Interned so that comparisons against string literals like
+        # key == 'ENTER' can short-circuit on identity. Some backends
+        # (glfw) pass the key text as an int codepoint, which can't
+        # be interned.
+        self.name = sys.intern(name if name.isupper() else name.upper())
+        self.text = sys.intern(text) if isinstance(text, str) else text
 
     def __eq__(self, other):
         if isinstance(other, str):
@@ -125,8 +148,15 @@ class Event:
 
     """
 
+    __slots__ = ('_modifiers', '_active', '_raw', '_mod_mask')
+
     def __init__(self, raw_event, active=False):
-        self._modifiers = list(map(lambda k: k.name, raw_event.modifiers))
+        mods = raw_event.modifiers
+        mask = 0
+        for m in mods:
+            mask |= _MOD_BITS.get(m.name, 0)
+        self._mod_mask = mask
+        self._modifiers = [m.name for m in mods]
         self._active = active
         self._raw = raw_event
 
@@ -145,7 +175,7 @@ class Event:
         :rtype: bool
 
         """
-        return 'Shift' in self._modifiers
+        return bool(self._mod_mask & _SHIFT)
 
     def is_ctrl_down(self):
         """Was ctrl (command on Mac) held down during the event?
@@ -154,7 +184,7 @@ class Event:
         :rtype: bool
 
         """
-        return 'Control' in self._modifiers
+        return bool(self._mod_mask & _CTRL)
 
     def is_alt_down(self):
         """Was alt held down during the event?
@@ -163,7 +193,7 @@ class Event:
         :rtype: bool
 
         """
-        return 'Alt' in self._modifiers
+        return bool(self._mod_mask & _ALT)
 
     def is_meta_down(self):
         """Was the meta key (windows/option key) held down?
@@ -172,7 +202,7 @@ class Event:
         :rtype: bool
 
         """
-        return 'Meta' in self._modifiers
+        return bool(self._mod_mask & _META)
 
     def _update_builtins(self):
         pass
@@ -189,6 +219,8 @@ class KeyEvent(Event):
 
     """
 
+    __slots__ = ('key',)
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
@@ -233,28 +265,69 @@ class MouseEvent(Event):
 
     """
 
+    __slots__ = ('_x', '_y', '_position', '_scroll', '_button')
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
-        x, y = self._raw.pos
-        x = max(min(builtins.width, x), 0)
-        y = max(min(builtins.height, builtins.height - y), 0)
-        dx, dy = self._raw.delta
-        
-        self.x = max(min(builtins.width, x), 0)
-        self.y = max(min(builtins.height, builtins.height - y), 0)
+        # All derived fields are only computed once they're needed,
+        # either when updating the builtins or when read by a handler.
+        self._x = None
+        self._y = None
+        self._position = None
+        self._scroll = None
+        self._button = None
+
+    def _materialize(self):
+        """Compute the mouse coordinates (clamped to the sketch window)
+        from the raw event.
+        """
+        if self._x is None:
+            w = builtins.width
+            h = builtins.height
+            x, y = self._raw.pos
+            self._x = 0 if x < 0 else w if x > w else x
+            self._y = 0 if y < 0 else h if y > h else y
+
+    @property
+    def x(self):
+        self._materialize()
+        return self._x
 
-        self.position = Position(x, y)
-        self.scroll = Position(int(dx), int(dy))
+    @property
+    def y(self):
+        self._materialize()
+        return self._y
+
+    @property
+    def position(self):
+        if self._position is None:
+            self._position = Position(self.x, builtins.height - self.y)
+        return self._position
 
-        self.count = self.scroll.y
-        self.button = MouseButton(self._raw.buttons)
+    @property
+    def scroll(self):
+        if self._scroll is None:
+            dx, dy = self._raw.delta
+            self._scroll = Position(int(dx), int(dy))
+        return self._scroll
+
+    @property
+    def count(self):
+        return self.scroll.y
+
+    @property
+    def button(self):
+        if self._button is None:
+            self._button = MouseButton(self._raw.buttons)
+        return self._button
 
     def _update_builtins(self):
+        self._materialize()
         builtins.pmouse_x = builtins.mouse_x
         builtins.pmouse_y = builtins.mouse_y
-        builtins.mouse_x = self.x
-        builtins.mouse_y = self.y
+        builtins.mouse_x = self._x
+        builtins.mouse_y = self._y
         builtins.mouse_is_pressed = self._active
         builtins.mouse_button = self.button if self.pressed else None
 
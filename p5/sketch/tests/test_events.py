@@ -0,0 +1,117 @@
+import builtins
+import unittest
+from types import SimpleNamespace
+
+from p5.sketch.events import Event, Key, KeyEvent, MouseButton, MouseEvent, VispyButton
+
+
+def _raw_event(modifiers=(), **kwargs):
+    return SimpleNamespace(
+        modifiers=[SimpleNamespace(name=m) for m in modifiers], **kwargs)
+
+
+class TestMouseButton(unittest.TestCase):
+
+    def test_buttons(self):
+        button = MouseButton([VispyButton.LEFT, VispyButton.MIDDLE])
+        self.assertEqual(button.buttons, ('LEFT', 'MIDDLE'))
+        self.assertEqual(repr(button), "MouseButton(LEFT, MIDDLE)")
+
+    def test_equality(self):
+        button = MouseButton([VispyButton.MIDDLE])
+        self.assertTrue(button == 'middle')
+        self.assertTrue(button == 'CENTER')
+        self.assertFalse(button == 'LEFT')
+        self.assertFalse(button == 'UNKNOWN')
+        self.assertTrue(button == MouseButton([3]))
+        self.assertFalse(button == MouseButton([1]))
+
+
+class TestKey(unittest.TestCase):
+
+    def test_name(self):
+        self.assertEqual(Key('enter').name, 'ENTER')
+        self.assertEqual(Key('ENTER').name, 'ENTER')
+        self.assertEqual(Key('1', '1').name, '1')
+        self.assertIs(Key(''.join(['ent', 'er'])).name, 'ENTER')
+
+    def test_equality(self):
+        key = Key('a', 'a')
+        self.assertTrue(key == 'A')
+        self.assertTrue(key == 'a')
+        self.assertFalse(key == 'b')
+        self.assertTrue(key == Key('A', 'a'))
+        self.assertEqual(str(key), 'a')
+        self.assertEqual(str(Key('enter', '\r')), 'ENTER')
+
+
+class TestEvent(unittest.TestCase):
+
+    def test_modifiers(self):
+        event = Event(_raw_event(['Shift', 'Meta']))
+        self.assertEqual(event.modifiers, ['Shift', 'Meta'])
+        self.assertTrue(event.is_shift_down())
+        self.assertFalse(event.is_ctrl_down())
+        self.assertFalse(event.is_alt_down())
+        self.assertTrue(event.is_meta_down())
+
+    def test_no_modifiers(self):
+        event = Event(_raw_event(), active=True)
+        self.assertTrue(event.pressed)
+        self.assertFalse(event.is_shift_down())
+        self.assertFalse(event.is_ctrl_down())
+
+
+class TestMouseEvent(unittest.TestCase):
+
+    def setUp(self):
+        builtins.width = 100
+        builtins.height = 50
+
+    def test_position(self):
+        event = MouseEvent(_raw_event(pos=(20, 10), delta=(0, 0), buttons=[]))
+        self.assertEqual((event.x, event.y), (20, 10))
+        self.assertEqual(event.position, (20, 40))
+
+    def test_clamp(self):
+        event = MouseEvent(_raw_event(pos=(-5, 80), delta=(0, 0), buttons=[]))
+        self.assertEqual((event.x, event.y), (0, 50))
+        event = MouseEvent(_raw_event(pos=(120, -3), delta=(0, 0), buttons=[]))
+        self.assertEqual((event.x, event.y), (100, 0))
+
+    def test_update_builtins(self):
+        builtins.mouse_x, builtins.mouse_y = 1, 2
+        event = MouseEvent(_raw_event(pos=(20, 10), delta=(0, 0),
+                                      buttons=[VispyButton.LEFT]),
+                           active=True)
+        event._update_builtins()
+        self.assertEqual((builtins.pmouse_x, builtins.pmouse_y), (1, 2))
+        self.assertEqual((builtins.mouse_x, builtins.mouse_y), (20, 10))
+        self.assertTrue(builtins.mouse_is_pressed)
+        self.assertEqual(builtins.mouse_button, 'LEFT')
+
+    def test_scroll_and_button(self):
+        event = MouseEvent(_raw_event(pos=(0, 0), delta=(1.0, -2.0),
+                                      buttons=[VispyButton.RIGHT]))
+        self.assertEqual(event.scroll, (1, -2))
+        self.assertEqual(event.count, -2)
+        self.assertEqual(event.button, 'RIGHT')
+
+
+class TestKeyEvent(unittest.TestCase):
+
+    def test_key(self):
+        raw = _raw_event(key=SimpleNamespace(name='Enter'), text='\r')
+        self.assertEqual(KeyEvent(raw).key, 'ENTER')
+
+    def test_non_str_text(self):
+        # the glfw backend reports the key text as an int codepoint
+        raw = _raw_event(key=SimpleNamespace(name='A'), text=97)
+        event = KeyEvent(raw)
+        self.assertEqual(event.key.name, 'A')
+        self.assertEqual(event.key.text, 97)
+        self.assertTrue(event.key == 'A')
+
+    def test_unknown_key(self):
+        raw = _raw_event(key=None, text='')
+        self.assertEqual(KeyEvent(raw).key.name, 'UNKNOWN')
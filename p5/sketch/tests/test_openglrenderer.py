@@ -0,0 +1,201 @@
+import math
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import numpy as np
+
+from p5.core.constants import SType
+from p5.sketch.Vispy2DRenderer import openglrenderer
+from p5.sketch.Vispy2DRenderer.openglrenderer import OpenGLRenderer
+from p5.sketch.Vispy2DRenderer.openglrenderer import _check_shape, _get_borders, _get_meshes, to_homogeneous
+
+
+def _shape(shape_type, n_vert, contours=()):
+    vertices = [(i, i, 0) for i in range(n_vert)]
+    return SimpleNamespace(shape_type=shape_type, vertices=vertices,
+                           contours=list(contours))
+
+
+def _edges(shape):
+    return [idx.tolist() for _, _, idx in _get_borders(shape)]
+
+
+def _triangle_count(meshes):
+    count = 0
+    for gl_name, _, idx in meshes:
+        count += len(idx) // 3 if gl_name == 'triangles' else len(idx) - 2
+    return count
+
+
+class TestHomogeneous(unittest.TestCase):
+
+    def test_2d(self):
+        self.assertEqual(to_homogeneous([(1, 2), (3, 4)]).tolist(),
+                         [[1, 2, 0, 1], [3, 4, 0, 1]])
+
+    def test_3d(self):
+        self.assertEqual(to_homogeneous(np.array([(1, 2, 3)])).tolist(),
+                         [[1, 2, 3, 1]])
+
+
+class TestTransformVertices(unittest.TestCase):
+
+    def setUp(self):
+        # _transform_vertices only needs the scratch buffer, so skip
+        # creating the GL programs
+        self.renderer = OpenGLRenderer.__new__(OpenGLRenderer)
+        self.renderer._xform_scratch = np.empty((1024, 4))
+        self.rng = np.random.default_rng(0)
+
+    def _check(self, n_vert):
+        vertices = to_homogeneous(self.rng.random((n_vert, 3)))
+        local_matrix = self.rng.random((4, 4))
+        global_matrix = self.rng.random((4, 4))
+
+        product = np.dot(np.dot(vertices, local_matrix.T), global_matrix.T)
+        expected = (product / product[:, 3][:, np.newaxis])[:, :3]
+
+        result = self.renderer._transform_vertices(
+            vertices, local_matrix, global_matrix)
+        self.assertEqual(result.shape, (n_vert, 3))
+        self.assertTrue(np.allclose(result, expected))
+        return result
+
+    def test_matches_two_step_transform(self):
+        self._check(5)
+
+    def test_scratch_growth(self):
+        self._check(3000)
+        self.assertGreaterEqual(len(self.renderer._xform_scratch), 3000)
+        self._check(10)
+
+    def test_results_do_not_alias_scratch(self):
+        first = self._check(5)
+        copy = first.copy()
+        self._check(5)
+        self.assertTrue(np.array_equal(first, copy))
+
+
+class TestCheckShape(unittest.TestCase):
+
+    def test_valid(self):
+        _check_shape(_shape(SType.TRIANGLES, 6))
+        _check_shape(_shape(SType.QUAD_STRIP, 6))
+        _check_shape(_shape(SType.POINTS, 1))
+        _check_shape(_shape(SType.TESS, 0))
+
+    def test_not_enough_vertices(self):
+        with self.assertRaises(ValueError):
+            _check_shape(_shape(SType.LINE_STRIP, 1))
+        with self.assertRaises(ValueError):
+            _check_shape(_shape(SType.QUADS, 3))
+
+    def test_wrong_multiple(self):
+        with self.assertRaises(ValueError):
+            _check_shape(_shape(SType.TRIANGLES, 4))
+        with self.assertRaises(ValueError):
+            _check_shape(_shape(SType.QUADS, 6))
+
+
+class TestBorders(unittest.TestCase):
+
+    def test_triangles(self):
+        self.assertEqual(
+            _edges(_shape(SType.TRIANGLES, 6)),
+            [[[0, 1], [1, 2], [2, 0], [3, 4], [4, 5], [5, 3]]])
+
+    def test_triangle_strip(self):
+        self.assertEqual(
+            _edges(_shape(SType.TRIANGLE_STRIP, 4)),
+            [[[0, 1], [1, 2], [2, 3], [0, 2], [1, 3]]])
+
+    def test_triangle_fan(self):
+        self.assertEqual(
+            _edges(_shape(SType.TRIANGLE_FAN, 4)),
+            [[[0, 1], [0, 2], [0, 3], [1, 2], [2, 3]]])
+
+    def test_quads(self):
+        self.assertEqual(
+            _edges(_shape(SType.QUADS, 8)),
+            [[[0, 1], [1, 2], [2, 3], [3, 0],
+              [4, 5], [5, 6], [6, 7], [7, 4]]])
+
+    def test_quad_strip(self):
+        self.assertEqual(
+            _edges(_shape(SType.QUAD_STRIP, 4)),
+            [[[0, 1], [2, 3], [0, 2], [1, 3]]])
+
+    def test_lines(self):
+        self.assertEqual(
+            _edges(_shape(SType.LINES, 4)),
+            [[[0, 1], [2, 3]]])
+
+    def test_tess(self):
+        contour = [(0, 0, 0), (1, 0, 0), (1, 1, 0)]
+        self.assertEqual(
+            _edges(_shape(SType.TESS, 3, contours=[contour])),
+            [[[0, 1], [1, 2]], [[0, 1], [1, 2]]])
+
+    def test_cached_indices_are_not_shared(self):
+        first = _get_borders(_shape(SType.QUADS, 4))[0][2]
+        first[0, 0] = 42
+        second = _get_borders(_shape(SType.QUADS, 4))[0][2]
+        self.assertTrue(np.array_equal(second[0], [0, 1]))
+
+
+class TestMeshes(unittest.TestCase):
+
+    def test_quads(self):
+        meshes = _get_meshes(_shape(SType.QUADS, 8))
+        self.assertEqual(len(meshes), 1)
+        self.assertEqual(meshes[0][0], 'triangles')
+        self.assertEqual(meshes[0][2].tolist(),
+                         [0, 1, 2, 0, 2, 3, 4, 5, 6, 4, 6, 7])
+        self.assertEqual(meshes[0][2].dtype, np.uint32)
+
+    def test_triangle_strip(self):
+        meshes = _get_meshes(_shape(SType.TRIANGLE_STRIP, 4))
+        self.assertEqual(meshes[0][0], 'triangle_strip')
+        self.assertEqual(meshes[0][2].tolist(), [0, 1, 2, 3])
+
+    def test_quad_strip(self):
+        meshes = _get_meshes(_shape(SType.QUAD_STRIP, 4))
+        self.assertEqual(meshes[0][0], 'triangle_strip')
+
+    @unittest.skipIf(openglrenderer.mapbox_earcut is None,
+                     "mapbox_earcut is not installed")
+    def test_tess_earcut(self):
+        square = [[0, 0], [100, 0], [100, 100], [0, 100]]
+        hole = [[25, 25], [75, 25], [75, 75], [25, 75]]
+        shape = SimpleNamespace(shape_type=SType.TESS, vertices=square,
+                                contours=[hole])
+        meshes = _get_meshes(shape)
+        self.assertEqual(len(meshes), 1)
+        gl_name, vertices, idx = meshes[0]
+        self.assertEqual(gl_name, 'triangles')
+        self.assertEqual(vertices.tolist(), square + hole)
+        self.assertEqual(len(idx), 8 * 3)
+        self.assertEqual(idx.dtype, np.uint32)
+
+    def test_tess_non_planar_falls_back(self):
+        vertices = [(0, 0, 0), (1, 0, 1), (1, 1, 0)]
+        self.assertIsNone(openglrenderer._earcut_triangulate(vertices, []))
+
+    @unittest.skipIf(openglrenderer.mapbox_earcut is None,
+                     "mapbox_earcut is not installed")
+    def test_tess_earcut_matches_glu(self):
+        star = [(math.cos(i * 4 * math.pi / 5), math.sin(i * 4 * math.pi / 5), 0)
+                for i in range(5)]
+        square = [(0, 0, 0), (100, 0, 0), (100, 100, 0), (0, 100, 0)]
+        outside = [(200, 200, 0), (210, 200, 0), (210, 210, 0)]
+        concave = [(0, 0, 0), (10, 0, 0), (10, 10, 0), (5, 2, 0), (0, 10, 0)]
+        shapes = [(star, []), (square, [outside]), (concave, [])]
+        for vertices, contours in shapes:
+            shape = SimpleNamespace(shape_type=SType.TESS, vertices=vertices,
+                                    contours=contours)
+            earcut_meshes = _get_meshes(shape)
+            with mock.patch.object(openglrenderer, 'mapbox_earcut', None):
+                glu_meshes = _get_meshes(shape)
+            self.assertEqual(_triangle_count(earcut_meshes),
+                             _triangle_count(glu_meshes))
@@ -0,0 +1,70 @@
+import builtins
+import unittest
+from unittest import mock
+
+from p5.core import p5
+
+# the 2D renderer loads its shaders based on the active renderer
+builtins.current_renderer = "vispy"
+p5.mode = "P2D"
+
+from p5.sketch.Vispy2DRenderer.renderer2d import VispyRenderer2D  # noqa: E402
+
+
+class TestFlushGeometry(unittest.TestCase):
+
+    def setUp(self):
+        # flush_geometry only dispatches to the render_* methods, so
+        # skip creating the GL programs
+        self.renderer = VispyRenderer2D.__new__(VispyRenderer2D)
+        self.renderer.render_line = mock.Mock()
+        self.renderer.render_default = mock.Mock()
+
+    def _flush(self, queue):
+        self.renderer.draw_queue = list(queue)
+        self.renderer.flush_geometry()
+        self.assertEqual(self.renderer.draw_queue, [])
+
+    def test_merges_consecutive_runs(self):
+        self._flush([('triangles', 't1'), ('triangles', 't2'),
+                     ('lines', 'l1'), ('lines', 'l2'), ('lines', 'l3'),
+                     ('points', 'p1'), ('points', 'p2')])
+        self.renderer.render_line.assert_called_once_with(['l1', 'l2', 'l3'])
+        self.assertEqual(self.renderer.render_default.call_args_list, [
+            mock.call('triangles', ['t1', 't2']),
+            mock.call('points', ['p1', 'p2']),
+        ])
+
+    def test_strips_and_fans_not_merged(self):
+        self._flush([('triangle_fan', 'f1'), ('triangle_fan', 'f2'),
+                     ('triangle_strip', 's1'), ('triangle_strip', 's2')])
+        self.renderer.render_line.assert_not_called()
+        self.assertEqual(self.renderer.render_default.call_args_list, [
+            mock.call('triangle_fan', ['f1']),
+            mock.call('triangle_fan', ['f2']),
+            mock.call('triangle_strip', ['s1']),
+            mock.call('triangle_strip', ['s2']),
+        ])
+
+    def test_preserves_order(self):
+        calls = []
+        self.renderer.render_line.side_effect = \
+            lambda queue: calls.append(('lines', queue))
+        self.renderer.render_default.side_effect = \
+            lambda shape, queue: calls.append((shape, queue))
+
+        self._flush([('triangles', 't1'), ('lines', 'l1'),
+                     ('triangles', 't2'), ('triangle_fan', 'f1'),
+                     ('lines', 'l2'), ('lines', 'l3')])
+        self.assertEqual(calls, [
+            ('triangles', ['t1']),
+            ('lines', ['l1']),
+            ('triangles', ['t2']),
+            ('triangle_fan', ['f1']),
+            ('lines', ['l2', 'l3']),
+        ])
+
+    def test_empty_queue(self):
+        self._flush([])
+        self.renderer.render_line.assert_not_called()
+        self.renderer.render_default.assert_not_called()